@@ -0,0 +1,85 @@
+from contextlib import asynccontextmanager
+from typing import List
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+
+import util
+
+# Run from the repository root: python inference_server.py
+# (or: uvicorn inference_server:app --port 8000)
+
+class VehicleSpecs(BaseModel):
+    """Vehicle specifications, matching util.predict_co2_emissions"""
+    model_config = ConfigDict(allow_inf_nan=False)
+
+    # Same ranges as the Streamlit app's input widgets
+    engine_size: float = Field(ge=0.5, le=8.0)
+    cylinders: int = Field(ge=3, le=16)
+    fuel_consumption_city: float = Field(ge=1.0, le=30.0)
+    fuel_consumption_hwy: float = Field(ge=1.0, le=25.0)
+    fuel_consumption_comb: float = Field(ge=1.0, le=30.0)
+    fuel_consumption_mpg: float = Field(ge=5.0, le=100.0)
+    vehicle_class: str
+    fuel_type: str
+
+    # util expects the upper-case codes; normalize once at the API boundary
+    @field_validator('vehicle_class', 'fuel_type')
+    @classmethod
+    def to_upper(cls, value):
+        return value.upper()
+
+    # Unknown categories are a 422, not a prediction for the baseline category
+    @model_validator(mode='after')
+    def check_categories(self):
+        util.check_categories(self.vehicle_class, self.fuel_type)
+        return self
+
+# Largest batch accepted by /predict/batch; bigger requests get a 422
+MAX_BATCH_VEHICLES = 1000
+
+class BatchRequest(BaseModel):
+    vehicles: List[VehicleSpecs] = Field(min_length=1, max_length=MAX_BATCH_VEHICLES)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load the model once for the lifetime of the process
+    util.load_saved_artifacts()
+    yield
+
+app = FastAPI(title="CO2 Emissions Predictor", lifespan=lifespan)
+
+@app.exception_handler(RequestValidationError)
+async def validation_error(request, exc):
+    # Like FastAPI's default 422, minus the echoed input, which can't be encoded
+    # as JSON when it is NaN or infinity
+    errors = [{key: error[key] for key in ('type', 'loc', 'msg')} for error in exc.errors()]
+    return JSONResponse(status_code=422, content={"detail": errors})
+
+# Plain (non-async) endpoints run in FastAPI's thread pool, so concurrent
+# requests reach util's batching worker together
+
+@app.get("/model")
+def model_info():
+    """Name and test-set R² of the model serving predictions"""
+    return {"name": util.get_model_name(), "accuracy": util.get_model_accuracy()}
+
+@app.post("/predict")
+def predict(specs: VehicleSpecs):
+    """Predict CO2 emissions (g/km) for one vehicle"""
+    return {"prediction": util.predict_co2_emissions(**specs.model_dump())}
+
+@app.post("/predict/batch")
+def predict_batch(request: BatchRequest):
+    """Predict CO2 emissions (g/km) for several vehicles with one model call"""
+    specs = [(v.engine_size, v.cylinders, v.fuel_consumption_city, v.fuel_consumption_hwy,
+              v.fuel_consumption_comb, v.fuel_consumption_mpg, v.vehicle_class, v.fuel_type)
+             for v in request.vehicles]
+    predictions = util.predict_co2_emissions_batch(util.build_feature_matrix(specs))
+    return {"predictions": [round(float(p), 2) for p in predictions]}
+
+if __name__ == '__main__':
+    uvicorn.run(app, host='127.0.0.1', port=8000)
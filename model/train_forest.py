@@ -0,0 +1,143 @@
+import os
+import json
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import r2_score
+from sklearn.model_selection import train_test_split
+
+# Run from the repository root: python model/train_forest.py
+
+# Smallest forest whose test R² may trail the largest candidate by this fraction
+R2_TOLERANCE = 0.002
+
+# Linear surrogate (CO2 ~ slope * combined consumption + intercept, per fuel type),
+# shipped only for the vehicle classes where it stays within SURROGATE_TOLERANCE g/km
+# of the forest on SURROGATE_COVERAGE of at least SURROGATE_MIN_VEHICLES held-out vehicles
+SURROGATE_FUEL_TYPES = ['X', 'Z']
+SURROGATE_MAX_CYLINDERS = 5
+SURROGATE_MAX_COMB_MISMATCH = 0.2  # L/100 km between combined and 0.55 city + 0.45 hwy
+SURROGATE_TOLERANCE = 3.0
+SURROGATE_COVERAGE = 0.95
+SURROGATE_MIN_VEHICLES = 20
+
+# Numeric features whose training range bounds the surrogate's region, by surrogate.json key
+SURROGATE_RANGES = {
+    'engine_size': 'Engine Size(L)',
+    'city': 'Fuel Consumption City (L/100 km)',
+    'hwy': 'Fuel Consumption Hwy (L/100 km)',
+    'comb': 'Fuel Consumption Comb (L/100 km)',
+    'mpg': 'Fuel Consumption Comb (mpg)'
+}
+
+def load_dataset():
+    """Build the app's feature matrix (columns.json) and target from the raw CSV"""
+    df = pd.read_csv('dataset/CO2 Emissions.csv')
+    df['Fuel Consumption Weighted'] = (
+        0.55 * df['Fuel Consumption City (L/100 km)'] +
+        0.45 * df['Fuel Consumption Hwy (L/100 km)']
+    )
+
+    with open('columns.json', 'r') as f:
+        data_columns = json.load(f)['data_columns']
+
+    # One-hot columns only exist for the categories listed in columns.json
+    X = pd.DataFrame(index=df.index)
+    for col in data_columns:
+        if col.startswith('Vehicle Class_'):
+            X[col] = (df['Vehicle Class'] == col[len('Vehicle Class_'):]).astype(float)
+        elif col.startswith('Fuel Type_'):
+            X[col] = (df['Fuel Type'] == col[len('Fuel Type_'):]).astype(float)
+        else:
+            X[col] = df[col]
+
+    return X, df['CO2 Emissions(g/km)']
+
+def save_metric(model_name, r2):
+    """Record a model's test R² in metrics.json, where the app reads its accuracy from"""
+    metrics = {}
+    if os.path.exists('metrics.json'):
+        with open('metrics.json', 'r') as f:
+            metrics = json.load(f)
+    metrics[model_name] = round(float(r2), 5)
+    with open('metrics.json', 'w') as f:
+        json.dump(metrics, f, indent=4)
+
+def fit_surrogate(model, X_train, X_test):
+    """Fit the per-fuel-type linear surrogate to the forest's own predictions"""
+    surrogate = {
+        'max_cylinders': SURROGATE_MAX_CYLINDERS,
+        'max_comb_mismatch': SURROGATE_MAX_COMB_MISMATCH,
+        'fuel_types': {}
+    }
+    # Classes without a one-hot column share the baseline encoding, so never qualify
+    vehicle_classes = [col[len('Vehicle Class_'):] for col in X_train.columns
+                       if col.startswith('Vehicle Class_')]
+
+    def in_region(X, fuel_type):
+        comb = X['Fuel Consumption Comb (L/100 km)']
+        return ((X[f'Fuel Type_{fuel_type}'] == 1)
+                & (X[[f'Vehicle Class_{c}' for c in vehicle_classes]].sum(axis=1) == 1)
+                & (X['Cylinders'] <= SURROGATE_MAX_CYLINDERS)
+                & ((comb - X['Fuel Consumption Weighted']).abs() <= SURROGATE_MAX_COMB_MISMATCH))
+
+    for fuel_type in SURROGATE_FUEL_TYPES:
+        train = X_train[in_region(X_train, fuel_type)]
+        slope, intercept = np.polyfit(train['Fuel Consumption Comb (L/100 km)'], model.predict(train), 1)
+        ranges = {key: (float(train[col].min()), float(train[col].max()))
+                  for key, col in SURROGATE_RANGES.items()}
+
+        in_ranges = in_region(X_test, fuel_type)
+        for key, col in SURROGATE_RANGES.items():
+            in_ranges &= X_test[col].between(*ranges[key])
+        test = X_test[in_ranges]
+        error = (model.predict(test) - (slope * test['Fuel Consumption Comb (L/100 km)'] + intercept)).abs()
+
+        # Validate each vehicle class on its own, so a well-covered class can't hide a poor one
+        covered = []
+        for vehicle_class in vehicle_classes:
+            class_error = error[test[f'Vehicle Class_{vehicle_class}'] == 1]
+            coverage = (class_error < SURROGATE_TOLERANCE).mean() if len(class_error) else 0.0
+            print(f"Surrogate for fuel type {fuel_type}, {vehicle_class}: {coverage:.1%} of "
+                  f"{len(class_error)} test vehicles within {SURROGATE_TOLERANCE} g/km of the forest "
+                  f"(worst {class_error.max():.1f} g/km)")
+            if len(class_error) >= SURROGATE_MIN_VEHICLES and coverage >= SURROGATE_COVERAGE:
+                covered.append(vehicle_class)
+
+        if covered:
+            coef = {'slope': round(float(slope), 4), 'intercept': round(float(intercept), 4)}
+            for key, (low, high) in ranges.items():
+                coef[f'{key}_min'], coef[f'{key}_max'] = low, high
+            coef['vehicle_classes'] = covered
+            surrogate['fuel_types'][fuel_type] = coef
+
+    return surrogate
+
+if __name__ == '__main__':
+    X, y = load_dataset()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=40)
+
+    # Sweep forest sizes, smallest (fewest trees x depth) first
+    candidates = []
+    for n_estimators in [20, 50, 100, 300]:
+        for max_depth in [6, 8, 10, 12]:
+            model = RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth,
+                                          min_samples_split=10, random_state=42)
+            model.fit(X_train, y_train)
+            r2 = r2_score(y_test, model.predict(X_test))
+            print(f"n_estimators={n_estimators}, max_depth={max_depth}: R² = {r2:.5f}")
+            candidates.append((n_estimators * max_depth, r2, model))
+
+    best_r2 = max(r2 for _, r2, _ in candidates)
+    size, r2, model = min((c for c in candidates if c[1] >= best_r2 * (1 - R2_TOLERANCE)),
+                          key=lambda c: (c[0], -c[1]))
+    print(f"\nSelected {model.get_params()['n_estimators']} trees of depth "
+          f"{model.get_params()['max_depth']} (R² = {r2:.5f}, best = {best_r2:.5f})")
+
+    # Saved uncompressed so the app can memory-map it (joblib.load(..., mmap_mode='r'))
+    joblib.dump(model, 'Co2_emissions.joblib')
+    save_metric('Random Forest', r2)
+
+    with open('surrogate.json', 'w') as f:
+        json.dump(fit_surrogate(model, X_train, X_test), f, indent=4)
@@ -0,0 +1,21 @@
+import ydf
+from sklearn.metrics import r2_score
+from sklearn.model_selection import train_test_split
+
+from train_forest import load_dataset, save_metric
+
+# Run from the repository root: python model/train_gbt.py
+# Trains a YDF gradient boosted trees regressor on the same features and split as
+# the forest; the app serves it instead of the forest when CO2_MODEL=gbt is set
+
+if __name__ == '__main__':
+    X, y = load_dataset()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=40)
+
+    learner = ydf.GradientBoostedTreesLearner(label='CO2', task=ydf.Task.REGRESSION)
+    model = learner.train(X_train.assign(CO2=y_train))
+    r2 = r2_score(y_test, model.predict(X_test))
+    print(f"\nGradient boosted trees: {model.num_trees()} trees, R² = {r2:.5f}")
+
+    model.save('co2_ydf')
+    save_metric('Gradient Boosted Trees', r2)
@@ -1,7 +1,16 @@
+import os
+import asyncio
 import streamlit as st
-import pandas as pd
 import util
 
+# Predictions come from the FastAPI service (inference_server.py) when this is set,
+# e.g. CO2_INFERENCE_URL=http://localhost:8000; otherwise the model is loaded in-process
+INFERENCE_URL = os.environ.get('CO2_INFERENCE_URL')
+
+# Field names of a vehicle spec tuple, in util.predict_co2_emissions argument order
+SPEC_FIELDS = ('engine_size', 'cylinders', 'fuel_consumption_city', 'fuel_consumption_hwy',
+               'fuel_consumption_comb', 'fuel_consumption_mpg', 'vehicle_class', 'fuel_type')
+
 # Page configuration
 st.set_page_config(
     page_title="CO2 Emissions Predictor",
@@ -10,66 +19,136 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS
-st.markdown("""
-    <style>
-    .main-header {
-        font-size: 3rem;
-        color: #1f77b4;
-        text-align: center;
-        margin-bottom: 2rem;
-    }
-    .prediction-box {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        padding: 2rem;
-        border-radius: 15px;
-        text-align: center;
-        margin: 2rem 0;
-        box-shadow: 0 10px 30px rgba(0,0,0,0.2);
-    }
-    .prediction-value {
-        font-size: 4rem;
-        font-weight: bold;
-        color: white;
-        text-shadow: 2px 2px 4px rgba(0,0,0,0.3);
-    }
-    .prediction-label {
-        color: white;
-        font-size: 1.2rem;
-        margin-bottom: 1rem;
-    }
-    .metric-card {
-        background-color: #f8f9fa;
-        padding: 1.5rem;
-        border-radius: 10px;
-        border-left: 4px solid #667eea;
-        margin: 0.5rem 0;
-    }
-    .success-box {
-        background-color: #d4edda;
-        border-left: 4px solid #28a745;
-        padding: 1rem;
-        border-radius: 5px;
-        margin: 1rem 0;
-    }
-    .warning-box {
-        background-color: #fff3cd;
-        border-left: 4px solid #ffc107;
-        padding: 1rem;
-        border-radius: 5px;
-        margin: 1rem 0;
-    }
-    </style>
-""", unsafe_allow_html=True)
+# Custom CSS, read once per server process
+@st.cache_resource
+def load_css():
+    with open('static/style.css', 'r') as f:
+        return f"<style>{f.read()}</style>"
+
+st.markdown(load_css(), unsafe_allow_html=True)
 
 # Load model
 @st.cache_resource
 def load_model():
-    util.load_saved_artifacts()
+    if INFERENCE_URL is None:
+        util.load_saved_artifacts()
     return True
 
+async def post_json(path, payload):
+    import httpx
+    async with httpx.AsyncClient(base_url=INFERENCE_URL) as client:
+        response = await client.post(path, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+async def get_json(path):
+    import httpx
+    async with httpx.AsyncClient(base_url=INFERENCE_URL) as client:
+        response = await client.get(path)
+        response.raise_for_status()
+        return response.json()
+
+# Cache predictions across script reruns
+@st.cache_data
+def predict(engine_size, cylinders, fuel_consumption_city, fuel_consumption_hwy,
+            fuel_consumption_comb, fuel_consumption_mpg, vehicle_class, fuel_type):
+    specs = dict(
+        engine_size=engine_size,
+        cylinders=cylinders,
+        fuel_consumption_city=fuel_consumption_city,
+        fuel_consumption_hwy=fuel_consumption_hwy,
+        fuel_consumption_comb=fuel_consumption_comb,
+        fuel_consumption_mpg=fuel_consumption_mpg,
+        vehicle_class=vehicle_class,
+        fuel_type=fuel_type
+    )
+    if INFERENCE_URL:
+        return asyncio.run(post_json('/predict', specs))['prediction']
+    return util.predict_co2_emissions(**specs)
+
+# Predict the fuel type and engine size comparisons with one batched model call
+@st.cache_data
+def predict_scenarios(inputs):
+    (engine_size, cylinders, fuel_consumption_city, fuel_consumption_hwy,
+     fuel_consumption_comb, fuel_consumption_mpg, vehicle_class, fuel_type) = inputs
+    fuel_types = list(util.get_fuel_types())
+    engine_sizes = [1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0, 5.5, 6.0]
+    
+    specs = [(engine_size, cylinders, fuel_consumption_city, fuel_consumption_hwy,
+              fuel_consumption_comb, fuel_consumption_mpg, vehicle_class, ft)
+             for ft in fuel_types]
+    specs += [(size, cylinders, fuel_consumption_city, fuel_consumption_hwy,
+               fuel_consumption_comb, fuel_consumption_mpg, vehicle_class, fuel_type)
+              for size in engine_sizes]
+    if INFERENCE_URL:
+        payload = {'vehicles': [dict(zip(SPEC_FIELDS, spec)) for spec in specs]}
+        predictions = asyncio.run(post_json('/predict/batch', payload))['predictions']
+    else:
+        predictions = [round(float(p), 2) for p in
+                       util.predict_co2_emissions_batch(util.build_feature_matrix(specs))]
+    
+    by_fuel_type = dict(zip(fuel_types, predictions[:len(fuel_types)]))
+    by_engine_size = dict(zip(engine_sizes, predictions[len(fuel_types):]))
+    return by_fuel_type, by_engine_size
+
+# HTML result fragments, rebuilt only when their inputs change
+@st.cache_data
+def render_prediction_box(prediction):
+    return f"""
+        <div class="prediction-box">
+            <div class="prediction-label">Predicted CO2 Emissions</div>
+            <div class="prediction-value">{prediction} g/km</div>
+        </div>
+    """
+
+@st.cache_data
+def render_metric_card(title, value, caption):
+    return f"""
+        <div class="metric-card">
+            <h4>{title}</h4>
+            <h2>{value}</h2>
+            <p>{caption}</p>
+        </div>
+    """
+
+@st.cache_data
+def render_recommendation(prediction, avg_emissions):
+    percentage_diff = ((prediction - avg_emissions) / avg_emissions) * 100
+    if prediction > avg_emissions:
+        return f"""
+            <div class="warning-box">
+                <h4>⚠️ Higher than average emissions</h4>
+                <p><strong>Your vehicle emits {percentage_diff:.1f}% more CO2 than average.</strong></p>
+                <p><strong>Consider:</strong></p>
+                <ul>
+                    <li>🚗 Carpooling or public transport</li>
+                    <li>🔧 Regular vehicle maintenance</li>
+                    <li>🍃 Eco-friendly driving habits</li>
+                    <li>🔄 Upgrading to a more efficient vehicle</li>
+                </ul>
+            </div>
+        """
+    return f"""
+        <div class="success-box">
+            <h4>✅ Below average emissions!</h4>
+            <p><strong>Your vehicle emits {abs(percentage_diff):.1f}% less CO2 than average.</strong></p>
+            <p>Great job! Your vehicle is more environmentally friendly than average. 🌍</p>
+        </div>
+    """
+
+# Model info, for whichever model is serving predictions
+@st.cache_resource
+def get_model_info():
+    if INFERENCE_URL:
+        info = asyncio.run(get_json('/model'))
+        name, accuracy = info['name'], info['accuracy']
+    else:
+        name, accuracy = util.get_model_name(), util.get_model_accuracy()
+    return name, "N/A" if accuracy is None else f"{accuracy:.2%}"
+
 # Initialize
 model_loaded = load_model()
+model_name, model_accuracy = get_model_info()
 
 # Header
 st.markdown('<h1 class="main-header">🌍 CO2 Emissions Predictor</h1>', unsafe_allow_html=True)
@@ -78,9 +157,9 @@ st.markdown("### Predict vehicle CO2 emissions based on specifications")
 # Sidebar
 with st.sidebar:
     st.header("📊 About")
-    st.info("""
+    st.info(f"""
     This application predicts CO2 emissions (g/km) based on vehicle specifications using a 
-    **Random Forest model** with **99.67% accuracy**.
+    **{model_name} model** with **{model_accuracy} accuracy** (R² on held-out vehicles).
     
     **Features:**
     - Real-time predictions
@@ -89,110 +168,106 @@ with st.sidebar:
     """)
     
     st.header("🔧 Model Info")
-    st.metric("Model Accuracy", "99.67%")
-    st.metric("Algorithm", "Random Forest")
+    st.metric("Model Accuracy", model_accuracy)
+    st.metric("Algorithm", model_name)
 
 # Main content
-col1, col2 = st.columns([1, 1])
+@st.fragment
+def prediction_panel():
+    col1, col2 = st.columns([1, 1])
 
-with col1:
-    st.header("🚗 Vehicle Specifications")
-    
-    # Input fields
-    vehicle_class = st.selectbox(
-        "Vehicle Class",
-        options=util.get_vehicle_classes(),
-        help="Select the vehicle class"
-    )
-    
-    fuel_types = util.get_fuel_types()
-    fuel_type = st.selectbox(
-        "Fuel Type",
-        options=list(fuel_types.keys()),
-        format_func=lambda x: f"{x} - {fuel_types[x]}",
-        help="Select the fuel type"
-    )
-    
-    engine_size = st.slider(
-        "Engine Size (L)",
-        min_value=0.5,
-        max_value=8.0,
-        value=2.0,
-        step=0.1,
-        help="Engine displacement in liters"
-    )
-    
-    cylinders = st.selectbox(
-        "Number of Cylinders",
-        options=[3, 4, 5, 6, 8, 10, 12, 16],
-        index=1,
-        help="Number of engine cylinders"
-    )
-    
-    st.subheader("⛽ Fuel Consumption")
-    
-    fuel_consumption_city = st.number_input(
-        "City (L/100 km)",
-        min_value=1.0,
-        max_value=30.0,
-        value=9.9,
-        step=0.1,
-        help="Fuel consumption in city driving"
-    )
-    
-    fuel_consumption_hwy = st.number_input(
-        "Highway (L/100 km)",
-        min_value=1.0,
-        max_value=25.0,
-        value=6.7,
-        step=0.1,
-        help="Fuel consumption on highway"
-    )
-    
-    fuel_consumption_comb = st.number_input(
-        "Combined (L/100 km)",
-        min_value=1.0,
-        max_value=30.0,
-        value=8.5,
-        step=0.1,
-        help="Combined fuel consumption"
-    )
-    
-    fuel_consumption_mpg = st.number_input(
-        "Combined (mpg)",
-        min_value=5.0,
-        max_value=100.0,
-        value=33.0,
-        step=0.5,
-        help="Fuel consumption in miles per gallon"
-    )
-    
-    predict_button = st.button("🔮 Predict CO2 Emissions", type="primary", use_container_width=True)
+    with col1:
+        st.header("🚗 Vehicle Specifications")
+        
+        # Input fields
+        vehicle_class = st.selectbox(
+            "Vehicle Class",
+            options=util.get_vehicle_classes(),
+            help="Select the vehicle class"
+        )
+        
+        fuel_types = util.get_fuel_types()
+        fuel_type = st.selectbox(
+            "Fuel Type",
+            options=list(fuel_types.keys()),
+            format_func=lambda x: f"{x} - {fuel_types[x]}",
+            help="Select the fuel type"
+        )
+        
+        engine_size = st.slider(
+            "Engine Size (L)",
+            min_value=0.5,
+            max_value=8.0,
+            value=2.0,
+            step=0.1,
+            help="Engine displacement in liters"
+        )
+        
+        cylinders = st.selectbox(
+            "Number of Cylinders",
+            options=[3, 4, 5, 6, 8, 10, 12, 16],
+            index=1,
+            help="Number of engine cylinders"
+        )
+        
+        st.subheader("⛽ Fuel Consumption")
+        
+        fuel_consumption_city = st.number_input(
+            "City (L/100 km)",
+            min_value=1.0,
+            max_value=30.0,
+            value=9.9,
+            step=0.1,
+            help="Fuel consumption in city driving"
+        )
+        
+        fuel_consumption_hwy = st.number_input(
+            "Highway (L/100 km)",
+            min_value=1.0,
+            max_value=25.0,
+            value=6.7,
+            step=0.1,
+            help="Fuel consumption on highway"
+        )
+        
+        fuel_consumption_comb = st.number_input(
+            "Combined (L/100 km)",
+            min_value=1.0,
+            max_value=30.0,
+            value=8.5,
+            step=0.1,
+            help="Combined fuel consumption"
+        )
+        
+        fuel_consumption_mpg = st.number_input(
+            "Combined (mpg)",
+            min_value=5.0,
+            max_value=100.0,
+            value=33.0,
+            step=0.5,
+            help="Fuel consumption in miles per gallon"
+        )
+        
+        predict_button = st.button("🔮 Predict CO2 Emissions", type="primary", use_container_width=True)
 
-with col2:
-    st.header("📈 Prediction Results")
-    
-    if predict_button:
-        with st.spinner("Calculating emissions..."):
-            # Make prediction
-            prediction = util.predict_co2_emissions(
-                engine_size=engine_size,
-                cylinders=cylinders,
-                fuel_consumption_city=fuel_consumption_city,
-                fuel_consumption_hwy=fuel_consumption_hwy,
-                fuel_consumption_comb=fuel_consumption_comb,
-                fuel_consumption_mpg=fuel_consumption_mpg,
-                vehicle_class=vehicle_class,
-                fuel_type=fuel_type
-            )
-            
+    with col2:
+        st.header("📈 Prediction Results")
+        
+        if predict_button:
+            with st.spinner("Calculating emissions..."):
+                # Round to the widgets' 0.1 step so float noise from the slider and
+                # number inputs doesn't split cache entries; keep it across reruns
+                st.session_state['inputs'] = (
+                    round(engine_size, 1), cylinders, round(fuel_consumption_city, 1),
+                    round(fuel_consumption_hwy, 1), round(fuel_consumption_comb, 1),
+                    round(fuel_consumption_mpg, 1), vehicle_class, fuel_type
+                )
+                st.session_state['prediction'] = predict(*st.session_state['inputs'])
+        
+        prediction = st.session_state.get('prediction')
+        if prediction is not None:
             # Display prediction
-            st.markdown(f"""
-                <div class="prediction-box">
-                    <div class="prediction-label">Predicted CO2 Emissions</div>
-                    <div class="prediction-value">{prediction} g/km</div>
-                </div>
-            """, unsafe_allow_html=True)
+            st.markdown(render_prediction_box(prediction), unsafe_allow_html=True)
             
             # Comparison with average
             avg_emissions = 250  # Average CO2 emissions
@@ -210,11 +285,25 @@ with col2:
             
             # Visual bar comparison
             st.markdown("### Visual Comparison")
-            comparison_data = pd.DataFrame({
-                'Category': ['Your Vehicle', 'Average Vehicle'],
-                'CO2 Emissions (g/km)': [prediction, avg_emissions]
-            })
-            st.bar_chart(comparison_data.set_index('Category'))
+            comparison_data = {
+                'CO2 Emissions (g/km)': {'Your Vehicle': prediction, 'Average Vehicle': avg_emissions}
+            }
+            st.bar_chart(comparison_data, x_label='Category')
+            
+            # What-if scenarios for the same vehicle
+            by_fuel_type, by_engine_size = predict_scenarios(st.session_state['inputs'])
+            fuel_type_names = util.get_fuel_types()
+            
+            st.markdown("### ⛽ By Fuel Type")
+            fuel_type_data = {
+                'CO2 Emissions (g/km)': {f"{ft} - {fuel_type_names[ft]}": value
+                                         for ft, value in by_fuel_type.items()}
+            }
+            st.bar_chart(fuel_type_data, x_label='Fuel Type')
+            
+            st.markdown("### 🔧 By Engine Size")
+            engine_size_data = {'CO2 Emissions (g/km)': by_engine_size}
+            st.line_chart(engine_size_data, x_label='Engine Size (L)')
             
             # Environmental impact
             st.subheader("🌱 Environmental Impact")
@@ -226,22 +315,13 @@ with col2:
             
             col_x, col_y = st.columns(2)
             with col_x:
-                st.markdown(f"""
-                    <div class="metric-card">
-                        <h4>📅 Yearly CO2</h4>
-                        <h2>{yearly_emissions:.1f} kg</h2>
-                        <p>({yearly_emissions_tons:.2f} tons)</p>
-                    </div>
-                """, unsafe_allow_html=True)
+                st.markdown(render_metric_card("📅 Yearly CO2", f"{yearly_emissions:.1f} kg",
+                                               f"({yearly_emissions_tons:.2f} tons)"),
+                            unsafe_allow_html=True)
             with col_y:
                 trees_needed = yearly_emissions / 21  # One tree absorbs ~21kg CO2/year
-                st.markdown(f"""
-                    <div class="metric-card">
-                        <h4>🌳 Trees to Offset</h4>
-                        <h2>{trees_needed:.0f} trees</h2>
-                        <p>per year</p>
-                    </div>
-                """, unsafe_allow_html=True)
+                st.markdown(render_metric_card("🌳 Trees to Offset", f"{trees_needed:.0f} trees", "per year"),
+                            unsafe_allow_html=True)
             
             # Additional metrics
             st.markdown("### 📍 Additional Insights")
@@ -254,44 +334,25 @@ with col2:
                 st.info(f"**Daily CO2**: {daily_emissions:.2f} kg")
             
             # Recommendations
-            if prediction > avg_emissions:
-                st.markdown(f"""
-                    <div class="warning-box">
-                        <h4>⚠️ Higher than average emissions</h4>
-                        <p><strong>Your vehicle emits {percentage_diff:.1f}% more CO2 than average.</strong></p>
-                        <p><strong>Consider:</strong></p>
-                        <ul>
-                            <li>🚗 Carpooling or public transport</li>
-                            <li>🔧 Regular vehicle maintenance</li>
-                            <li>🍃 Eco-friendly driving habits</li>
-                            <li>🔄 Upgrading to a more efficient vehicle</li>
-                        </ul>
-                    </div>
-                """, unsafe_allow_html=True)
-            else:
-                st.markdown(f"""
-                    <div class="success-box">
-                        <h4>✅ Below average emissions!</h4>
-                        <p><strong>Your vehicle emits {abs(percentage_diff):.1f}% less CO2 than average.</strong></p>
-                        <p>Great job! Your vehicle is more environmentally friendly than average. 🌍</p>
-                    </div>
-                """, unsafe_allow_html=True)
-    else:
-        st.info("👈 Enter vehicle specifications and click 'Predict' to see results")
-        
-        # Show example
-        st.subheader("📝 Example Input")
-        example_data = {
-            "Specification": ["Vehicle Class", "Fuel Type", "Engine Size", "Cylinders", 
-                            "City Consumption", "Highway Consumption"],
-            "Value": ["COMPACT", "X (Regular)", "2.0 L", "4", "9.9 L/100km", "6.7 L/100km"]
-        }
-        st.table(pd.DataFrame(example_data))
+            st.markdown(render_recommendation(prediction, avg_emissions), unsafe_allow_html=True)
+        else:
+            st.info("👈 Enter vehicle specifications and click 'Predict' to see results")
+            
+            # Show example
+            st.subheader("📝 Example Input")
+            example_data = {
+                "Specification": ["Vehicle Class", "Fuel Type", "Engine Size", "Cylinders", 
+                                "City Consumption", "Highway Consumption"],
+                "Value": ["COMPACT", "X (Regular)", "2.0 L", "4", "9.9 L/100km", "6.7 L/100km"]
+            }
+            st.table(example_data)
+
+prediction_panel()
 
 # Footer
 st.markdown("---")
-st.markdown("""
+st.markdown(f"""
     <div style='text-align: center; color: #666;'>
-        <p>Built with Streamlit | Model Accuracy: 99.67% | Random Forest Regressor</p>
+        <p>Built with Streamlit | Model Accuracy: {model_accuracy} | {model_name}</p>
     </div>
 """, unsafe_allow_html=True)
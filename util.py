@@ -1,30 +1,191 @@
-import pickle
+import os
+import asyncio
+import atexit
+import functools
 import json
+import threading
+import warnings
+from collections import namedtuple
+import joblib
 import numpy as np
-import pandas as pd
+
+# ONNX Runtime is optional; fall back to scikit-learn when it is not installed
+try:
+    import onnxruntime as ort
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+except ImportError:
+    ort = None
+
+# TreeLite/TL2cgen are optional; they compile the forest into a native library
+try:
+    import treelite
+    import tl2cgen
+except ImportError:
+    tl2cgen = None
+
+# YDF is optional; it serves the gradient boosted trees from model/train_gbt.py
+try:
+    import ydf
+except ImportError:
+    ydf = None
+
+# Numba is optional; without it the feature kernel runs as plain Python
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+# The model was fitted on a DataFrame; predicting on a plain ndarray is intended
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
 
 __model = None
 __data_columns = None
+__session = None
+__predictor = None
+__ydf_model = None
+__col_index = None
+__numeric_idx = None
+__vclass_idx = None
+__fuel_idx = None
+__known_vehicle_classes = None
+__known_fuel_types = None
+__surrogate = None
+__metrics = None
+
+# Range keys in surrogate.json, by position in __numeric_columns
+__surrogate_ranges = {'engine_size': 0, 'city': 2, 'hwy': 3, 'comb': 4, 'mpg': 5}
+
+# Per-thread (1, n_features) buffer reused by single-vehicle predictions
+__scratch = threading.local()
+
+# Concurrent predictions are collected into one model call by a background worker
+MAX_BATCH_SIZE = 32
+MAX_BATCH_LATENCY = 0.002  # seconds
+InferenceRequest = namedtuple('InferenceRequest', ['future', 'features'])
+__batch_loop = None
+__batch_queue = None
+__batch_worker = None
+__batch_lock = threading.Lock()
+__batch_pending = 0  # callers whose row the worker hasn't collected yet
+
+# Numeric features, in the order predict_co2_emissions fills them in
+__numeric_columns = [
+    'Engine Size(L)',
+    'Cylinders',
+    'Fuel Consumption City (L/100 km)',
+    'Fuel Consumption Hwy (L/100 km)',
+    'Fuel Consumption Comb (L/100 km)',
+    'Fuel Consumption Comb (mpg)',
+    'Fuel Consumption Weighted'
+]
 
 def load_saved_artifacts():
     """Load the trained model and column configuration"""
     global __model
     global __data_columns
+    global __session
+    global __predictor
+    global __ydf_model
+    global __col_index
+    global __numeric_idx
+    global __vclass_idx
+    global __fuel_idx
+    global __known_vehicle_classes
+    global __known_fuel_types
+    global __surrogate
+    global __metrics
     
     print("Loading saved artifacts...")
     
-    # Load the trained model
-    with open('Co2_emissions.pickle', 'rb') as f:
-        __model = pickle.load(f)
+    # Load the trained model; mmap_mode maps the file's numpy arrays read-only, but
+    # scikit-learn copies each tree's node arrays when unpickling, so every process
+    # still holds its own copy of the trees
+    __model = joblib.load('Co2_emissions.joblib', mmap_mode='r')
+    
+    # Load the linear surrogate fitted alongside the model (model/train_forest.py), if any
+    __surrogate = None
+    if os.path.exists('surrogate.json'):
+        with open('surrogate.json', 'r') as f:
+            __surrogate = json.load(f)
+    
+    # Load the test-set R² the training scripts recorded for each model, if any
+    __metrics = {}
+    if os.path.exists('metrics.json'):
+        with open('metrics.json', 'r') as f:
+            __metrics = json.load(f)
     
     # Load column configuration
     with open("columns.json", "r") as f:
-        __data_columns = json.load(f)['data_columns']
+        __data_columns = tuple(json.load(f)['data_columns'])
+    
+    # Map column names to positions in the feature vector
+    __col_index = {name: i for i, name in enumerate(__data_columns)}
+    missing = [name for name in __numeric_columns if name not in __col_index]
+    if missing:
+        raise ValueError(f"columns.json is missing numeric features: {missing}")
+    __numeric_idx = np.array([__col_index[name] for name in __numeric_columns], dtype=np.int64)
+    
+    # Map one-hot category values to their column positions, e.g. 'COMPACT' -> index of "Vehicle Class_COMPACT"
+    __vclass_idx = {name[len('Vehicle Class_'):]: i for name, i in __col_index.items()
+                    if name.startswith('Vehicle Class_')}
+    __fuel_idx = {name[len('Fuel Type_'):]: i for name, i in __col_index.items()
+                  if name.startswith('Fuel Type_')}
+    
+    # Categories accepted as input: those offered by the app plus any the model has a column for
+    __known_vehicle_classes = set(get_vehicle_classes()) | set(__vclass_idx)
+    __known_fuel_types = set(get_fuel_types()) | set(__fuel_idx)
+    
+    # Drop predictions cached against a previously loaded model
+    _predict_cached.cache_clear()
+    
+    # Serve the gradient boosted trees instead of the forest only when asked to (CO2_MODEL=gbt)
+    __ydf_model = None
+    __predictor = None
+    __session = None
+    if os.environ.get('CO2_MODEL') == 'gbt':
+        if ydf is None:
+            raise ImportError("CO2_MODEL=gbt requires ydf (pip install ydf)")
+        __ydf_model = ydf.load_model('co2_ydf')
+    
+    # Otherwise compile the forest to a shared library (cached on disk) with TreeLite;
+    # if that fails (e.g. no gcc), fall through to ONNX / scikit-learn
+    if __ydf_model is None and tl2cgen is not None:
+        try:
+            if _needs_rebuild('co2_rf.so'):
+                print("Compiling model with TreeLite (one-time, may take a few minutes)...")
+                tl2cgen.export_lib(
+                    treelite.sklearn.import_model(__model),
+                    toolchain='gcc',
+                    libpath='./co2_rf.so',
+                    # quantize buckets split thresholds into small integer bin indices
+                    params={'parallel_comp': 8, 'quantize': 1}
+                )
+            __predictor = tl2cgen.Predictor('./co2_rf.so')
+        except Exception as e:
+            print(f"TreeLite compilation failed, skipping it: {e}")
+    
+    # Otherwise convert the model to ONNX (cached on disk) and serve it with onnxruntime
+    if __ydf_model is None and __predictor is None and ort is not None:
+        if _needs_rebuild('Co2_emissions.onnx'):
+            onnx_model = convert_sklearn(
+                __model,
+                initial_types=[('input', FloatTensorType([None, len(__data_columns)]))]
+            )
+            with open('Co2_emissions.onnx', 'wb') as f:
+                f.write(onnx_model.SerializeToString())
+        __session = ort.InferenceSession('Co2_emissions.onnx', providers=['CPUExecutionProvider'])
     
     print("Model and artifacts loaded successfully!")
 
+def _needs_rebuild(path):
+    """Return True if a compiled model artifact is missing or older than the saved model"""
+    return (not os.path.exists(path)
+            or os.path.getmtime(path) < os.path.getmtime('Co2_emissions.joblib'))
+
 def get_data_columns():
-    """Return the list of feature columns"""
+    """Return the feature columns, in model input order, as a tuple"""
     return __data_columns
 
 def predict_co2_emissions(engine_size, cylinders, fuel_consumption_city, 
@@ -48,44 +209,277 @@ def predict_co2_emissions(engine_size, cylinders, fuel_consumption_city,
     fuel_consumption_mpg : float
         Fuel consumption in mpg
     vehicle_class : str
-        Vehicle class (e.g., 'COMPACT', 'SUV - SMALL', 'MID-SIZE', 'SUV - STANDARD', 'FULL-SIZE')
+        Vehicle class, upper case as returned by get_vehicle_classes()
+        (e.g., 'COMPACT', 'SUV - SMALL', 'MID-SIZE', 'SUV - STANDARD', 'FULL-SIZE')
     fuel_type : str
-        Fuel type (e.g., 'X' for Regular gasoline, 'Z' for Premium gasoline, 'D' for Diesel)
+        Fuel type code, upper case as returned by get_fuel_types()
+        (e.g., 'X' for Regular gasoline, 'Z' for Premium gasoline, 'D' for Diesel)
     
     Returns:
     --------
     float : Predicted CO2 emissions in g/km
+    
+    Raises ValueError for a vehicle class or fuel type that isn't known.
+    
+    Repeated calls with the same specifications are served from an LRU cache;
+    inputs are used as given, exactly as predict_co2_emissions_batch uses them.
     """
     
+    return _predict_cached(
+        float(engine_size),
+        float(cylinders),
+        float(fuel_consumption_city),
+        float(fuel_consumption_hwy),
+        float(fuel_consumption_comb),
+        float(fuel_consumption_mpg),
+        vehicle_class,
+        fuel_type
+    )
+
+@functools.lru_cache(maxsize=4096)
+def _predict_cached(engine_size, cylinders, fuel_consumption_city,
+                    fuel_consumption_hwy, fuel_consumption_comb,
+                    fuel_consumption_mpg, vehicle_class, fuel_type):
+    """Predict CO2 emissions for one vehicle (memoized)"""
+    
+    # Reuse this thread's buffer: numeric slots are always overwritten, so only the
+    # one-hot slots set by the previous call need clearing. The thread blocks until
+    # its prediction returns, so the worker never sees the buffer change under it.
+    if getattr(__scratch, 'columns', None) is not __data_columns:
+        __scratch.columns = __data_columns
+        __scratch.x = np.zeros((1, len(__data_columns)), dtype=np.float32)
+        __scratch.touched = []
+    x = __scratch.x
+    x[0, __scratch.touched] = 0
+    __scratch.touched = _fill_features(x[0], engine_size, cylinders, fuel_consumption_city,
+                                       fuel_consumption_hwy, fuel_consumption_comb,
+                                       fuel_consumption_mpg, vehicle_class, fuel_type)
+    
+    # Skip the forest where the linear surrogate is known to track it closely
+    prediction = _predict_surrogate(x)[0]
+    if np.isnan(prediction):
+        prediction = _predict_batched(x)
+    return round(float(prediction), 2)
+
+def _predict_surrogate(x):
+    """Return closed-form predictions for rows inside the surrogate's validated region, NaN elsewhere"""
+    predictions = np.full(len(x), np.nan)
+    
+    # The surrogate was fitted to the forest, so it doesn't stand in for the boosted trees
+    if __surrogate is None or __ydf_model is not None:
+        return predictions
+    
+    fuel_consumption_comb = x[:, __numeric_idx[4]]
+    fuel_consumption_weighted = x[:, __numeric_idx[6]]
+    
+    # Combined consumption must agree with city/highway, as it does in the training data
+    consistent = ((x[:, __numeric_idx[1]] <= __surrogate['max_cylinders'])
+                  & (np.abs(fuel_consumption_comb - fuel_consumption_weighted)
+                     <= __surrogate['max_comb_mismatch']))
+    
+    for fuel_type, coef in __surrogate['fuel_types'].items():
+        rows = (consistent
+                & (x[:, __fuel_idx[fuel_type]] == 1)
+                & (x[:, [__vclass_idx[c] for c in coef['vehicle_classes']]] == 1).any(axis=1))
+        
+        # Every numeric input must lie within the range the surrogate was validated on
+        for key, i in __surrogate_ranges.items():
+            value = x[:, __numeric_idx[i]]
+            rows &= (value >= coef[f'{key}_min']) & (value <= coef[f'{key}_max'])
+        predictions[rows] = coef['slope'] * fuel_consumption_comb[rows] + coef['intercept']
+    return predictions
+
+def build_feature_matrix(specs):
+    """
+    Build the model input for several vehicles at once
+    
+    Parameters:
+    -----------
+    specs : list of tuple
+        One tuple per vehicle, with the arguments of predict_co2_emissions in order:
+        (engine_size, cylinders, fuel_consumption_city, fuel_consumption_hwy,
+         fuel_consumption_comb, fuel_consumption_mpg, vehicle_class, fuel_type)
+    
+    Returns:
+    --------
+    np.ndarray : float32 array of shape (len(specs), n_features)
+    """
+    
+    # Create a feature matrix with all features initialized to 0
+    x = np.zeros((len(specs), len(__data_columns)), dtype=np.float32)
+    for row, spec in zip(x, specs):
+        _fill_features(row, *spec)
+    return x
+
+def _fill_features(row, engine_size, cylinders, fuel_consumption_city,
+                   fuel_consumption_hwy, fuel_consumption_comb,
+                   fuel_consumption_mpg, vehicle_class, fuel_type):
+    """Write one vehicle's features into a zeroed feature row; return the one-hot slots set"""
+    check_categories(vehicle_class, fuel_type)
+    
+    # Resolve one-hot columns; -1 means the category has no column (baseline level)
+    vehicle_class_idx = __vclass_idx.get(vehicle_class, -1)
+    fuel_type_idx = __fuel_idx.get(fuel_type, -1)
+    _fill_features_kernel(row, engine_size, cylinders, fuel_consumption_city,
+                          fuel_consumption_hwy, fuel_consumption_comb, fuel_consumption_mpg,
+                          vehicle_class_idx, fuel_type_idx, __numeric_idx)
+    return [i for i in (vehicle_class_idx, fuel_type_idx) if i >= 0]
+
+def check_categories(vehicle_class, fuel_type):
+    """Raise ValueError unless the vehicle class and fuel type are known"""
+    # Unknown values would otherwise silently get the baseline (all-zero) encoding
+    if vehicle_class not in __known_vehicle_classes:
+        raise ValueError(f"Unknown vehicle class {vehicle_class!r}, "
+                         f"expected one of {sorted(__known_vehicle_classes)}")
+    if fuel_type not in __known_fuel_types:
+        raise ValueError(f"Unknown fuel type {fuel_type!r}, "
+                         f"expected one of {sorted(__known_fuel_types)}")
+
+@njit(cache=True)
+def _fill_features_kernel(row, engine_size, cylinders, fuel_consumption_city,
+                          fuel_consumption_hwy, fuel_consumption_comb, fuel_consumption_mpg,
+                          vehicle_class_idx, fuel_type_idx, numeric_idx):
+    """Set numeric and one-hot features by position (compiled with Numba when available)"""
+    
+    # Set the numeric features (same order as __numeric_columns)
+    row[numeric_idx[0]] = engine_size
+    row[numeric_idx[1]] = cylinders
+    row[numeric_idx[2]] = fuel_consumption_city
+    row[numeric_idx[3]] = fuel_consumption_hwy
+    row[numeric_idx[4]] = fuel_consumption_comb
+    row[numeric_idx[5]] = fuel_consumption_mpg
+    
     # Calculate weighted fuel consumption (as done in training)
-    fuel_consumption_weighted = (fuel_consumption_city * 0.55 + fuel_consumption_hwy * 0.45)
-    
-    # Create a dataframe with all features initialized to 0
-    x = pd.DataFrame(np.zeros((1, len(__data_columns))), columns=__data_columns)
-    
-    # Set the numeric features (using exact capitalized names from model)
-    x['Engine Size(L)'] = engine_size
-    x['Cylinders'] = cylinders
-    x['Fuel Consumption City (L/100 km)'] = fuel_consumption_city
-    x['Fuel Consumption Hwy (L/100 km)'] = fuel_consumption_hwy
-    x['Fuel Consumption Comb (L/100 km)'] = fuel_consumption_comb
-    x['Fuel Consumption Comb (mpg)'] = fuel_consumption_mpg
-    x['Fuel Consumption Weighted'] = fuel_consumption_weighted
-    
-    # Set vehicle class (one-hot encoded) - format: "Vehicle Class_COMPACT"
-    vehicle_class_col = f"Vehicle Class_{vehicle_class.upper()}"
-    if vehicle_class_col in __data_columns:
-        x[vehicle_class_col] = 1
-    
-    # Set fuel type (one-hot encoded) - format: "Fuel Type_X"
-    fuel_type_col = f"Fuel Type_{fuel_type.upper()}"
-    if fuel_type_col in __data_columns:
-        x[fuel_type_col] = 1
-    
-    # Make prediction
-    prediction = __model.predict(x)[0]
-    
-    return round(prediction, 2)
+    row[numeric_idx[6]] = fuel_consumption_city * 0.55 + fuel_consumption_hwy * 0.45
+    
+    # Set one-hot encoded vehicle class and fuel type
+    if vehicle_class_idx >= 0:
+        row[vehicle_class_idx] = 1.0
+    if fuel_type_idx >= 0:
+        row[fuel_type_idx] = 1.0
+
+def predict_co2_emissions_batch(x):
+    """
+    Predict CO2 emissions for many feature rows with a single model call
+    
+    Parameters:
+    -----------
+    x : np.ndarray
+        Array of shape (N, n_features), e.g. from build_feature_matrix
+    
+    Returns:
+    --------
+    np.ndarray : Predicted CO2 emissions in g/km, shape (N,)
+    """
+    
+    # Backends can't take zero rows (YDF crashes on them)
+    if len(x) == 0:
+        return np.empty(0)
+    
+    # Every backend walks its trees on float32 features; convert once up front
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    
+    # Rows inside the surrogate's region get the same closed-form answer as
+    # predict_co2_emissions; only the rest go through the model
+    predictions = _predict_surrogate(x)
+    rest = np.isnan(predictions)
+    if rest.any():
+        predictions[rest] = _predict_model(x[rest])
+    return predictions
+
+def _predict_model(x):
+    """Run the loaded model on a float32 feature matrix"""
+    if __ydf_model is not None:
+        return __ydf_model.predict({name: x[:, i] for i, name in enumerate(__data_columns)})
+    if __predictor is not None:
+        return __predictor.predict(tl2cgen.DMatrix(x)).reshape(-1)
+    if __session is not None:
+        return __session.run(None, {'input': x})[0].reshape(-1)
+    return __model.predict(x)
+
+def _predict_batched(x):
+    """Predict a single feature row through the background batching worker"""
+    global __batch_loop
+    global __batch_queue
+    global __batch_worker
+    global __batch_pending
+    
+    # Start the worker's event loop on first use
+    with __batch_lock:
+        if __batch_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='co2-inference', daemon=True).start()
+            __batch_queue = asyncio.Queue()
+            __batch_worker = asyncio.run_coroutine_threadsafe(_batch_worker(__batch_queue), loop)
+            __batch_loop = loop
+            atexit.register(_stop_batch_worker)
+        __batch_pending += 1
+    
+    return asyncio.run_coroutine_threadsafe(_enqueue(x), __batch_loop).result()
+
+async def _enqueue(x):
+    """Queue a feature row for the worker and wait for its prediction"""
+    future = asyncio.get_running_loop().create_future()
+    await __batch_queue.put(InferenceRequest(future, x))
+    return await future
+
+async def _batch_worker(queue):
+    """Drain queued requests into batches and run one model call per batch"""
+    global __batch_pending
+    loop = asyncio.get_running_loop()
+    while True:
+        # Wait for a request, then take whatever else is already queued
+        requests = [await queue.get()]
+        while len(requests) < MAX_BATCH_SIZE and not queue.empty():
+            requests.append(queue.get_nowait())
+        
+        # Hold the batch open briefly only while other callers are still submitting;
+        # a lone request is predicted straight away
+        deadline = loop.time() + MAX_BATCH_LATENCY
+        while len(requests) < MAX_BATCH_SIZE and _waiting_callers(requests) > 0:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                requests.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        # None is queued at interpreter exit; serve the current batch, then stop
+        stopping = None in requests
+        requests = [r for r in requests if r is not None]
+        with __batch_lock:
+            __batch_pending -= len(requests)
+        
+        if requests:
+            try:
+                predictions = _predict_model(np.vstack([r.features for r in requests]))
+            except Exception as e:
+                for r in requests:
+                    r.future.set_exception(e)
+            else:
+                for r, prediction in zip(requests, predictions):
+                    r.future.set_result(float(prediction))
+        if stopping:
+            return
+
+def _waiting_callers(requests):
+    """Return how many callers have submitted a row that isn't in this batch yet"""
+    return __batch_pending - sum(r is not None for r in requests)
+
+def _stop_batch_worker():
+    """Shut down the batching worker and its event loop"""
+    asyncio.run_coroutine_threadsafe(__batch_queue.put(None), __batch_loop).result()
+    __batch_worker.result()
+    __batch_loop.call_soon_threadsafe(__batch_loop.stop)
+
+def get_model_name():
+    """Return the name of the algorithm serving predictions"""
+    return 'Gradient Boosted Trees' if __ydf_model is not None else 'Random Forest'
+
+def get_model_accuracy():
+    """Return the test-set R² of the model serving predictions, or None if it wasn't recorded"""
+    return __metrics.get(get_model_name())
 
 def get_vehicle_classes():
     """Return available vehicle classes"""